@@ -1,16 +1,71 @@
-from dash import Dash, dcc, html, callback, Input, Output
+import functools
+import hashlib
+import json
+import pathlib
+import shutil
+import tempfile
+import time
+
+from dash import Dash, dcc, html, callback, ctx, Input, Output, Patch, State
+from flask import abort, make_response, request
+from flask_caching import Cache
+from flask_compress import Compress
+import numpy as np
+import plotly
 import plotly.express as px
 import plotly.graph_objects as go
+import plotly.io as pio
+from plotly.offline import get_plotlyjs, get_plotlyjs_version
+
+try:
+    from numba import njit
+except ImportError:  # listed in requirements; tolerated missing (e.g. no wheel) via the NumPy fallback
+    njit = None
 
 # ---------- Styles (Bootstrap via CDN) ----------
 EXTERNAL_CSS = ["https://cdn.jsdelivr.net/npm/bootstrap@5.3.1/dist/css/bootstrap.min.css"]
 
 # ---------- App ----------
+# Dash encodes every callback response through plotly's JSON engine; orjson is several times faster
+pio.json.config.default_engine = "orjson"
 app = Dash(__name__, external_stylesheets=EXTERNAL_CSS)
 server = app.server  # for deployment if needed
+# Figure JSON (the dataset table above all) compresses 5-10x; browsers already send Accept-Encoding
+server.config["COMPRESS_ALGORITHM"] = ["br", "gzip"]
+Compress(server)
+# Cross-worker figure cache. The directory is keyed on this file and the plotly version (payloads embed
+# plotly's templates/encoding), so a redeploy or upgrade never serves stale figures. Directories nobody has
+# touched for a week are pruned; a concurrently running version (e.g. blue/green) keeps its live cache.
+# The threshold sits above the whole valid key space (~1200 bar + 72 map combinations); other inputs
+# are never cached (see prejson_cache).
+CACHE_ROOT = pathlib.Path(tempfile.gettempdir(), "dash-cache")
+CACHE_DIR = CACHE_ROOT / hashlib.sha1(pathlib.Path(__file__).read_bytes()
+                                      + plotly.__version__.encode()).hexdigest()[:12]
+CACHE_PRUNE_AGE = 7 * 86400
+
+def last_touched(path):
+    return max([path.stat().st_mtime] + [child.stat().st_mtime for child in path.iterdir()])
+
+if CACHE_ROOT.is_dir():
+    for stale in CACHE_ROOT.iterdir():
+        try:
+            if stale != CACHE_DIR and time.time() - last_touched(stale) > CACHE_PRUNE_AGE:
+                shutil.rmtree(stale, ignore_errors=True)
+        except OSError:  # vanished or unreadable meanwhile: leave it for the next startup
+            pass
+cache = Cache(server, config={
+    "CACHE_TYPE": "FileSystemCache",
+    "CACHE_DIR": str(CACHE_DIR),
+    "CACHE_THRESHOLD": 2048,
+    "CACHE_DEFAULT_TIMEOUT": 86400,
+})
 
 # ---------- Stable dataset from plotly ----------
 df = px.data.gapminder()  # columns: country, continent, year, lifeExp, pop, gdpPercap, iso_alpha, iso_num
+# Narrow key columns: equality filters/grouping compare small integer codes instead of strings/int64
+df["continent"] = df["continent"].astype("category")
+df["year"] = df["year"].astype(np.int16)
+df["iso_alpha"] = df["iso_alpha"].astype("category")
 
 # Pretty names for the table only (不影响内部计算)
 TABLE_COL_RENAME = {
@@ -24,6 +79,15 @@ TABLE_COL_RENAME = {
     "iso_num": "ISO Numeric Code",
 }
 table_df = df.rename(columns=TABLE_COL_RENAME)
+# Plain Python lists up front, so the table never converts ndarrays when it is built/serialized
+TABLE_HEADERS = [TABLE_COL_RENAME.get(c, c) for c in df.columns]
+TABLE_VALS = [table_df[h].tolist() for h in TABLE_HEADERS]
+
+# Narrow numeric columns (after the table keeps full precision): halves the bytes plotly
+# serializes for every bar/map trace. pop peaks around 1.3e9, well inside int32.
+df["pop"] = df["pop"].astype(np.int32)
+df["gdpPercap"] = df["gdpPercap"].astype(np.float32)
+df["lifeExp"] = df["lifeExp"].astype(np.float32)
 
 continents = sorted(df["continent"].unique().tolist())
 years = sorted(df["year"].unique().tolist())
@@ -31,7 +95,30 @@ years = sorted(df["year"].unique().tolist())
 continent_options = [{"label": c, "value": c} for c in continents]
 year_options = [{"label": str(y), "value": int(y)} for y in years]
 VAR_MAP = {"Population": "pop", "GDP per Capita": "gdpPercap", "Life Expectancy": "lifeExp"}
+VAR_MAP_INV = {col: label for label, col in VAR_MAP.items()}
+BAR_METRICS = ("pop", "gdpPercap", "lifeExp")  # order of the population / gdp / life_expectancy graphs
 var_options = [{"label": k, "value": k} for k in VAR_MAP.keys()]
+TOP_N_VALUES = tuple(range(5, 26, 5))
+# d3 formats for bar labels / map hover, so float32 values don't show their widening noise
+VALUE_FORMAT = {"pop": ",d", "gdpPercap": ",.2f", "lifeExp": ".1f"}
+
+# ---------- Precomputed slices (filter keys come from small closed sets) ----------
+DF_IDX = df.set_index(["continent", "year"]).sort_index()
+BAR_SLICES = {
+    (c, int(y)): DF_IDX.xs((c, y), drop_level=False).reset_index()
+                       .sort_values("pop", ascending=False).reset_index(drop=True)
+    for c, y in DF_IDX.index.unique()
+}
+YEAR_SLICES = {int(y): g for y, g in df.groupby("year", sort=False)}
+# Map slices carry only the columns the choropleth actually uses
+MAP_SLICES = {
+    (y, col): g[["iso_alpha", "country", col]]
+    for y, g in YEAR_SLICES.items() for col in VAR_MAP.values()
+}
+EMPTY_SLICE = df.iloc[0:0]
+
+def bar_slice(continent, year):
+    return BAR_SLICES.get((continent, int(year)), EMPTY_SLICE)
 
 # ---------- Theme helpers ----------
 def theme_settings(theme):
@@ -39,6 +126,14 @@ def theme_settings(theme):
         return dict(template="plotly_dark", page_bg="#111827", card_bg="#1f2937", text="#e5e7eb")
     return dict(template="plotly_white", page_bg="#e5ecf6", card_bg="#ffffff", text="#111827")
 
+THEME_TEMPLATES = {theme_settings(theme)["template"] for theme in ("light", "dark")}
+
+# Style dicts depend only on the theme name: build them once so paint_theme is a lookup
+PAGE_STYLE = {theme: {"backgroundColor": theme_settings(theme)["page_bg"], "minHeight": "100vh"}
+              for theme in ("light", "dark")}
+CARD_STYLE = {theme: {"backgroundColor": theme_settings(theme)["card_bg"], "color": theme_settings(theme)["text"]}
+              for theme in ("light", "dark")}
+
 def empty_figure(msg="No data available for current filters."):
     fig = go.Figure()
     fig.add_annotation(text=msg, xref="paper", yref="paper", x=0.5, y=0.5,
@@ -48,60 +143,205 @@ def empty_figure(msg="No data available for current filters."):
                       margin=dict(t=40, l=20, r=20, b=20), height=420)
     return fig
 
-def make_bar(filtered, x_col, y_col, title, template, orient="v", top_n=15):
+def _top_n_numpy(values, k):
+    # Stable descending sort (slices are <=52 rows): ties keep first seen, exactly like _top_n_loop
+    return np.argsort(-values, kind="stable")[:k]
+
+def _top_n_loop(values, k):
+    # Single pass keeping a descending insertion-sorted buffer of the k largest (ties keep first seen)
+    k = min(k, values.size)
+    top = np.empty(k, np.int64)
+    n = 0
+    for i in range(values.size):
+        v = values[i]
+        if n < k:
+            j = n
+            n += 1
+        elif v > values[top[k - 1]]:
+            j = k - 1
+        else:
+            continue
+        while j > 0 and values[top[j - 1]] < v:
+            top[j] = top[j - 1]
+            j -= 1
+        top[j] = i
+    return top
+
+# The loop is only worth it compiled. Explicit signatures (int32 pop, float32 gdpPercap/lifeExp) compile it
+# eagerly at import instead of inside the first user's callback; cache=True reuses the machine code.
+TOP_N_SIGNATURES = ["int64[:](int32[:], int64)", "int64[:](float32[:], int64)"]
+top_n_indices = njit(TOP_N_SIGNATURES, cache=True)(_top_n_loop) if njit is not None else _top_n_numpy
+
+def bar_parts(filtered, x_col, y_col, orient="v", top_n=15):
+    # The pieces of a bar figure that depend on top_n/orient: trace props and axis titles
+    values = filtered[y_col].to_numpy()
+    idx = top_n_indices(values, int(top_n))
+    x = filtered[x_col].to_numpy()[idx]
+    y = values[idx]
+    value_axis, label_axis = ("y", "x") if orient == "v" else ("x", "y")
+    value_fmt = VALUE_FORMAT.get(y_col, "")
+    trace = dict(x=x if orient == "v" else y, y=y if orient == "v" else x, orientation=orient,
+                 texttemplate=f"%{{{value_axis}:{value_fmt}}}",
+                 hovertemplate=f"{x_col}=%{{{label_axis}}}<br>{y_col}=%{{{value_axis}:{value_fmt}}}<extra></extra>",
+                 marker=dict(color=list(range(len(x))), colorscale="Viridis"))
+    titles = (x_col, y_col) if orient == "v" else (y_col, x_col)
+    return trace, titles
+
+def make_bar(filtered, x_col, y_col, title, template, orient="v", top_n=15, meta=None):
     if filtered.empty:
         return empty_figure()
-    data = filtered.sort_values(by=y_col, ascending=False).head(int(top_n))
-    if orient == "h":
-        fig = px.bar(data, x=y_col, y=x_col, color=x_col, text_auto=True, orientation="h", title=title)
-    else:
-        fig = px.bar(data, x=x_col, y=y_col, color=x_col, text_auto=True, title=title)
-    fig.update_layout(template=template, paper_bgcolor="rgba(0,0,0,0)", height=600, legend_title="")
-    fig.update_traces(textposition="outside", cliponaxis=False)
+    trace, (x_title, y_title) = bar_parts(filtered, x_col, y_col, orient, top_n)
+    # Single go.Bar colored by rank: skips plotly.express' long-form frame and per-category traces
+    fig = go.Figure(go.Bar(**trace, textposition="outside", cliponaxis=False))
+    fig.update_layout(template=template, paper_bgcolor="rgba(0,0,0,0)", height=600, title=title,
+                      xaxis_title=x_title, yaxis_title=y_title, meta=meta)
     return fig
 
+def patch_bar(filtered, x_col, y_col, orient="v", top_n=15):
+    # Partial update for a rendered bar figure of the same slice and orientation: only the top-N arrays
+    # change. Everything else (orientation, axis types plotly.js wrote back, titles) must stay as it is.
+    trace, _ = bar_parts(filtered, x_col, y_col, orient, top_n)
+    patch = Patch()
+    for key in ("x", "y", "marker"):
+        patch["data"][0][key] = trace[key]
+    return patch
+
 def create_table(template):
-    headers = [TABLE_COL_RENAME.get(c, c) for c in df.columns]
-    vals = [table_df[h].values for h in headers]
-    fig = go.Figure(data=[go.Table(header=dict(values=headers, align="left"),
-                                   cells=dict(values=vals, align="left"))])
+    fig = go.Figure(data=[go.Table(header=dict(values=TABLE_HEADERS, align="left"),
+                                   cells=dict(values=TABLE_VALS, align="left"))])
     fig.update_layout(template=template, paper_bgcolor="rgba(0,0,0,0)",
                       margin=dict(t=0, l=0, r=0, b=0), height=700)
     return fig
 
-def create_population_chart(continent="Asia", year=1952, template="plotly_white", orient="v", top_n=15):
-    filtered = df[(df["continent"] == continent) & (df["year"] == int(year))]
-    return make_bar(filtered, x_col="country", y_col="pop",
-                    title=f"Population for {continent} in {year}",
-                    template=template, orient=orient, top_n=top_n)
-
-def create_gdp_chart(continent="Asia", year=1952, template="plotly_white", orient="v", top_n=15):
-    filtered = df[(df["continent"] == continent) & (df["year"] == int(year))]
-    return make_bar(filtered, x_col="country", y_col="gdpPercap",
-                    title=f"GDP per Capita for {continent} in {year}",
-                    template=template, orient=orient, top_n=top_n)
-
-def create_life_exp_chart(continent="Asia", year=1952, template="plotly_white", orient="v", top_n=15):
-    filtered = df[(df["continent"] == continent) & (df["year"] == int(year))]
-    return make_bar(filtered, x_col="country", y_col="lifeExp",
-                    title=f"Life Expectancy for {continent} in {year}",
-                    template=template, orient=orient, top_n=top_n)
+def create_bar_chart(metric, continent="Asia", year=1952, template="plotly_white", orient="v", top_n=15):
+    return make_bar(bar_slice(continent, year), x_col="country", y_col=metric,
+                    title=f"{VAR_MAP_INV[metric]} for {continent} in {year}",
+                    template=template, orient=orient, top_n=top_n, meta=[continent, int(year), orient])
 
-def create_choropleth_map(variable_display, year, template):
+def choropleth_parts(variable_display, year):
+    # The whole choropleth trace plus its title, or None when the year has no data
     var_col = VAR_MAP.get(variable_display, "lifeExp")
-    filtered = df[df["year"] == int(year)]
+    filtered = MAP_SLICES.get((int(year), var_col), EMPTY_SLICE)
     if filtered.empty:
+        return None
+    trace = dict(type="choropleth", locations=filtered["iso_alpha"].to_numpy(), locationmode="ISO-3",
+                 z=filtered[var_col].to_numpy(), colorscale="RdYlBu",
+                 text=filtered["country"].to_numpy(), colorbar=dict(title=dict(text=var_col)),
+                 hovertemplate="iso_alpha=%{location}<br>country=%{text}<br>"
+                               f"{var_col}=%{{z:{VALUE_FORMAT.get(var_col, '')}}}<extra></extra>")
+    return trace, f"{variable_display} Choropleth Map [{year}]"
+
+def create_choropleth_map(variable_display, year, template):
+    parts = choropleth_parts(variable_display, year)
+    if parts is None:
         return empty_figure()
-    fig = px.choropleth(filtered, color=var_col, locations="iso_alpha", locationmode="ISO-3",
-                        color_continuous_scale="RdYlBu",
-                        hover_data=["country", var_col],
-                        title=f"{variable_display} Choropleth Map [{year}]")
-    fig.update_layout(template=template, dragmode=False, paper_bgcolor="rgba(0,0,0,0)",
-                      height=600, margin={"l": 0, "r": 0})
+    trace, title = parts
+    fig = go.Figure(data=[trace])
+    fig.update_layout(title=title, template=template, dragmode=False, meta="choropleth",
+                      paper_bgcolor="rgba(0,0,0,0)", height=600, margin={"l": 0, "r": 0})
     return fig
 
+def patch_map(trace, title):
+    # Replace the trace and title wholesale; geo/layout/template on the page stay untouched
+    patch = Patch()
+    patch["data"][0] = trace
+    patch["layout"]["title"]["text"] = title
+    return patch
+
+# ---------- Cached figure payloads ----------
+# Builders are pure functions of small closed-domain inputs. Cache the figure already run through
+# plotly's JSON encoder (plain lists/dicts, no numpy or Figure objects), so Dash's own encoding of a
+# cache hit is a trivial pass and no Figure is ever shared/mutated between callbacks.
+def prejson(fig):
+    return json.loads(pio.to_json(fig, validate=False))
+
+def prejson_cache(maxsize=None, valid=None):
+    def decorator(func):
+        @functools.wraps(func)
+        def encoded(*args):
+            result = func(*args)
+            if isinstance(result, tuple):
+                return tuple(prejson(fig) for fig in result)
+            return prejson(result)
+        cached = functools.lru_cache(maxsize=maxsize)(cache.memoize()(encoded))
+
+        # Only the closed domain of real UI values is cached; anything else a client posts is built uncached
+        @functools.wraps(func)
+        def wrapper(*args):
+            return cached(*args) if valid is None or valid(*args) else encoded(*args)
+        return wrapper
+    return decorator
+
+# Template objects shipped to the browser once, so theme switches re-template figures client-side
+PLOTLY_TEMPLATES = {theme: pio.templates[theme_settings(theme)["template"]].to_plotly_json()
+                    for theme in ("light", "dark")}
+
+def valid_bar_args(continent, year, template, orient, top_n):
+    return (continent in continents and year in years and template in THEME_TEMPLATES
+            and orient in ("v", "h") and top_n in TOP_N_VALUES)
+
+def valid_map_args(variable_display, year, template):
+    return isinstance(variable_display, str) and variable_display in VAR_MAP and year in years and template in THEME_TEMPLATES
+
+@prejson_cache(maxsize=2048, valid=valid_bar_args)
+def bar_figures(continent, year, template, orient, top_n):
+    return tuple(create_bar_chart(metric, continent, year, template=template, orient=orient, top_n=top_n)
+                 for metric in BAR_METRICS)
+
+@prejson_cache(maxsize=256, valid=valid_map_args)
+def map_figure(variable_display, year, template):
+    return create_choropleth_map(variable_display, year, template)
+
+# ---------- Static dataset table ----------
+# The table only varies by theme, so render it to standalone HTML once per theme and serve it as a plain
+# page in an iframe: its ~1704x8 cells never go through Dash callbacks or JSON (de)serialization.
+# The iframe can't reuse the page's plotly.js, so the app serves its own bundled copy (no CDN dependency).
+# Both URLs carry a content version, so browsers may cache them for a year and theme toggles after the
+# first of each theme are served from the browser cache.
+TABLE_ROUTE = f"{app.config.routes_pathname_prefix}dataset-table/"
+# Version in the path rather than a query: to_html only treats include_plotlyjs as a URL if it ends in ".js"
+PLOTLYJS_SRC = app.get_relative_path(f"/dataset-table/{get_plotlyjs_version()}/plotly.min.js")
+
+def table_html(theme):
+    t = theme_settings(theme)
+    fig = create_table(t["template"])
+    fig.update_layout(paper_bgcolor=t["card_bg"])
+    # Fixed div id: to_html's default is a random uuid, which would change the page hash on every import
+    div = pio.to_html(fig, include_plotlyjs=PLOTLYJS_SRC, full_html=False, div_id="dataset-table")
+    return (f'<html><head><meta charset="utf-8"></head>'
+            f'<body style="margin:0;background:{t["card_bg"]}">{div}</body></html>')
+
+TABLE_HTML = {theme: table_html(theme) for theme in ("light", "dark")}
+TABLE_ETAGS = {theme: hashlib.sha1(page.encode()).hexdigest() for theme, page in TABLE_HTML.items()}
+TABLE_SRC = {theme: app.get_relative_path(f"/dataset-table/{theme}") + f"?v={TABLE_ETAGS[theme][:12]}"
+             for theme in TABLE_HTML}
+
+def immutable_response(body, etag, mimetype):
+    response = make_response(body)
+    response.mimetype = mimetype
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = 365 * 86400
+    return response.make_conditional(request)
+
+@functools.lru_cache(maxsize=None)
+def plotlyjs_bundle():
+    return get_plotlyjs()
+
+@server.route(f"{TABLE_ROUTE}<version>/plotly.min.js")
+def serve_table_plotlyjs(version):
+    return immutable_response(plotlyjs_bundle(), get_plotlyjs_version(), "application/javascript")
+
+@server.route(f"{TABLE_ROUTE}<theme>")
+def serve_table(theme):
+    if theme not in TABLE_HTML:
+        abort(404)
+    return immutable_response(TABLE_HTML[theme], TABLE_ETAGS[theme], "text/html")
+
 # ---------- Layout (Header + Sidebar + Content) ----------
 app.layout = html.Div(id="page-root", children=[
+    dcc.Store(id="plotly-templates", data=PLOTLY_TEMPLATES),
+
     # Header / Navbar
     html.Div(className="d-flex align-items-center justify-content-between px-3 py-2 shadow-sm",
              children=[
@@ -138,8 +378,8 @@ app.layout = html.Div(id="page-root", children=[
                     html.Hr(className="my-3"),
                     html.Div(className="mb-2 fw-semibold text-uppercase small text-muted", children="Bar Appearance"),
                     html.Label("Top N countries", className="form-label mt-1"),
-                    dcc.Slider(id="topn", min=5, max=25, step=5, value=15,
-                               marks={i: str(i) for i in range(5, 26, 5)}),
+                    dcc.Slider(id="topn", min=TOP_N_VALUES[0], max=TOP_N_VALUES[-1], step=5, value=15,
+                               marks={i: str(i) for i in TOP_N_VALUES}),
                     html.Label("Orientation", className="form-label mt-3"),
                     dcc.RadioItems(
                         id="bar-orient",
@@ -165,7 +405,8 @@ app.layout = html.Div(id="page-root", children=[
                 html.Div(className="p-3 rounded-4 shadow-sm mb-3", id="card-table", children=[
                     html.Div(className="d-flex justify-content-between align-items-center mb-2",
                              children=[html.H6("Dataset", className="fw-bold m-0")]),
-                    dcc.Graph(id="dataset")
+                    html.Iframe(id="dataset", src=TABLE_SRC["light"],
+                                style={"width": "100%", "height": "700px", "border": "0"})
                 ]),
                 # Row of three charts
                 html.Div(className="row", children=[
@@ -210,15 +451,42 @@ app.layout = html.Div(id="page-root", children=[
     Input("theme-toggle", "value")
 )
 def paint_theme(theme):
-    t = theme_settings(theme)
-    page_style = {"backgroundColor": t["page_bg"], "minHeight": "100vh"}
-    card_style = {"backgroundColor": t["card_bg"], "color": t["text"]}
-    return page_style, card_style, card_style, card_style, card_style, card_style, card_style
+    theme = theme if theme in PAGE_STYLE else "light"
+    return (PAGE_STYLE[theme],) + (CARD_STYLE[theme],) * 6
 
-@callback(Output("dataset", "figure"), Input("theme-toggle", "value"))
-def update_table(theme):
-    t = theme_settings(theme)
-    return create_table(template=t["template"])
+# Theme switches only swap layout.template, so do it in the browser instead of rebuilding figures
+app.clientside_callback(
+    """
+    function(theme, templates, ...figures) {
+        const template = templates[theme];
+        return figures.map(fig => fig ? {...fig, layout: {...fig.layout, template: template}}
+                                      : window.dash_clientside.no_update);
+    }
+    """,
+    Output("population", "figure", allow_duplicate=True),
+    Output("gdp", "figure", allow_duplicate=True),
+    Output("life_expectancy", "figure", allow_duplicate=True),
+    Output("choropleth_map", "figure", allow_duplicate=True),
+    Input("theme-toggle", "value"),
+    State("plotly-templates", "data"),
+    State("population", "figure"),
+    State("gdp", "figure"),
+    State("life_expectancy", "figure"),
+    State("choropleth_map", "figure"),
+    prevent_initial_call=True,
+)
+
+app.clientside_callback(
+    f"""
+    function(theme) {{
+        const src = {json.dumps(TABLE_SRC)};
+        return src[theme] || src.light;
+    }}
+    """,
+    Output("dataset", "src"),
+    Input("theme-toggle", "value"),
+    prevent_initial_call=True,
+)
 
 @callback(
     Output("population", "figure"),
@@ -226,26 +494,41 @@ def update_table(theme):
     Output("life_expectancy", "figure"),
     Input("cont_all", "value"),
     Input("year_all", "value"),
-    Input("theme-toggle", "value"),
     Input("topn", "value"),
     Input("bar-orient", "value"),
+    State("theme-toggle", "value"),
+    State("population", "figure"),
+    State("gdp", "figure"),
+    State("life_expectancy", "figure"),
 )
-def update_bars(continent, year, theme, topn, orient):
+def update_bars(continent, year, topn, orient, theme, *figures):
+    # Patch only when top_n alone changed AND every graph already shows this slice/orientation: the renderer
+    # can merge several changed inputs into one request or drop a superseded full update, so the figures'
+    # layout.meta stamp is checked rather than trusting the trigger alone.
+    stamp = [continent, int(year), orient]
+    if set(ctx.triggered_prop_ids) == {"topn.value"} and all(
+            fig and fig.get("layout", {}).get("meta") == stamp for fig in figures):
+        filtered = bar_slice(continent, year)
+        return tuple(patch_bar(filtered, "country", metric, orient, topn) for metric in BAR_METRICS)
     t = theme_settings(theme)
-    fig1 = create_population_chart(continent, year, template=t["template"], orient=orient, top_n=topn)
-    fig2 = create_gdp_chart(continent, year, template=t["template"], orient=orient, top_n=topn)
-    fig3 = create_life_exp_chart(continent, year, template=t["template"], orient=orient, top_n=topn)
-    return fig1, fig2, fig3
+    return bar_figures(continent, int(year), t["template"], orient, int(topn))
 
 @callback(
     Output("choropleth_map", "figure"),
     Input("var_map", "value"),
     Input("year_map", "value"),
-    Input("theme-toggle", "value"),
+    State("theme-toggle", "value"),
+    State("choropleth_map", "figure"),
 )
-def update_map(var_display, year, theme):
+def update_map(var_display, year, theme, figure):
+    # A rendered choropleth only needs its trace and title swapped (the patch replaces both whole, so merged
+    # or dropped requests can't leave it inconsistent); first render and empty years get full figures.
+    if ctx.triggered_id is not None and figure and figure.get("layout", {}).get("meta") == "choropleth":
+        parts = choropleth_parts(var_display, year)
+        if parts is not None:
+            return patch_map(*parts)
     t = theme_settings(theme)
-    return create_choropleth_map(var_display, year, template=t["template"])
+    return map_figure(var_display, int(year), t["template"])
 
 if __name__ == "__main__":
     app.run(debug=True)